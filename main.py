@@ -13,6 +13,9 @@ from pathlib import Path
 # Add src directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
+# Enable XLA auto-clustering on CPU (must be set before TensorFlow is imported)
+os.environ.setdefault('TF_XLA_FLAGS', '--tf_xla_auto_jit=2 --tf_xla_cpu_global_jit')
+
 from src.data_pipeline import TFXPipeline
 from src.utils import setup_logging, create_directories
 
@@ -36,10 +39,10 @@ def main():
         # Check if data exists
         data_file = os.path.join(data_root, 'adult.data')
         if not os.path.exists(data_file):
-            logger.warning(f"Data file not found at {data_file}")
+            logger.warning("Data file not found at %s", data_file)
             logger.info("Please download the Census Income dataset from:")
             logger.info("https://archive.ics.uci.edu/ml/machine-learning-databases/adult/adult.data")
-            logger.info(f"Save it as {data_file}")
+            logger.info("Save it as %s", data_file)
             return
         
         # Initialize pipeline
@@ -62,7 +65,7 @@ def main():
         pipeline.demonstrate_metadata_tracking()
         
     except Exception as e:
-        logger.error(f"Pipeline execution failed: {str(e)}")
+        logger.error("Pipeline execution failed: %s", e)
         raise
     
     logger.info("Lab completed successfully!")
@@ -4,36 +4,75 @@ Enhanced version with custom modifications and better error handling
 """
 
 import os
+import sys
 import logging
-import tensorflow as tf
-import tensorflow_data_validation as tfdv
+from pathlib import Path
 
-from tfx import v1 as tfx
-from tfx.orchestration.experimental.interactive.interactive_context import InteractiveContext
-from tensorflow_metadata.proto.v0 import schema_pb2
+# TensorFlow, TFDV and TFX are imported inside the methods that use them,
+# since importing them takes seconds and is not needed until a run starts
 
-from .schema_manager import SchemaManager
+from .schema_manager import SchemaManager, CENSUS_COLUMNS, CENSUS_FEATURES
 from .metadata_tracker import MetadataTracker
 
+# Run Beam-based component executors (StatisticsGen, ExampleValidator, ...)
+# across all local cores instead of the single-threaded in-memory runner
+DEFAULT_BEAM_PIPELINE_ARGS = [
+    '--direct_running_mode=multi_processing',
+    '--direct_num_workers=0',
+]
+
+# Integer-valued columns of the Census Income CSV file
+CENSUS_INT_COLUMNS = frozenset([
+    'age', 'fnlwgt', 'education-num', 'capital-gain', 'capital-loss', 'hours-per-week'
+])
+
+# Number of CSV rows decoded per vectorized parse call
+CSV_BATCH_SIZE = 4096
+
+# Pipeline name used when running all components under LocalDagRunner
+LOCAL_DAG_PIPELINE_NAME = 'schema_lab'
+
+def _in_notebook():
+    """Check whether the code is running inside a Jupyter/IPython kernel"""
+    return 'ipykernel' in sys.modules
+
 class TFXPipeline:
     """Enhanced TFX Pipeline with custom modifications"""
     
-    def __init__(self, pipeline_root='./pipeline/', data_root='./data/census_data'):
+    def __init__(self, pipeline_root='./pipeline/', data_root='./data/census_data',
+                 beam_pipeline_args=None, enable_cache=True, use_local_dag_runner=False):
         """
         Initialize the TFX Pipeline
         
         Args:
             pipeline_root (str): Path to pipeline metadata store
             data_root (str): Path to raw data directory
+            beam_pipeline_args (list): Beam options for component executors
+                (default: DEFAULT_BEAM_PIPELINE_ARGS)
+            enable_cache (bool): Reuse cached component outputs when inputs
+                are unchanged (default: True)
+            use_local_dag_runner (bool): Run the full pipeline as a single DAG
+                with LocalDagRunner instead of component by component
+                (default: False)
         """
         self.pipeline_root = pipeline_root
         self.data_root = data_root
         self.data_filepath = os.path.join(data_root, 'adult.data')
         
+        if beam_pipeline_args is None:
+            beam_pipeline_args = DEFAULT_BEAM_PIPELINE_ARGS
+        self.beam_pipeline_args = list(beam_pipeline_args)
+        self.enable_cache = enable_cache
+        self.use_local_dag_runner = use_local_dag_runner
+        
         self.logger = logging.getLogger(__name__)
         
         # Initialize Interactive Context
-        self.context = InteractiveContext(pipeline_root=pipeline_root)
+        from tfx.orchestration.experimental.interactive.interactive_context import InteractiveContext
+        self.context = InteractiveContext(
+            pipeline_root=pipeline_root,
+            beam_pipeline_args=self.beam_pipeline_args
+        )
         
         # Initialize managers
         self.schema_manager = SchemaManager()
@@ -42,15 +81,141 @@ class TFXPipeline:
         # Component storage
         self.components = {}
         
-        self.logger.info(f"TFX Pipeline initialized with data root: {data_root}")
+        self.logger.info("TFX Pipeline initialized with data root: %s", data_root)
+    
+    def _csv_to_tfrecord(self):
+        """
+        Convert the CSV data file to TFRecord examples
+        
+        Rows are decoded in batches with a vectorized tf.io.decode_csv call;
+        serialization to tf.train.Example stays per row but reuses a single
+        proto for rows without empty fields. Empty fields are left out of the
+        example, and a header row must match CENSUS_COLUMNS. The file is
+        written to a temporary path and moved into place when complete. It is
+        reused while the size and mtime recorded for the CSV file still match.
+        
+        Returns:
+            str: Directory containing the TFRecord file
+        """
+        tfrecord_dir = os.path.join(self.pipeline_root, 'tfrecord_examples')
+        tfrecord_file = os.path.join(tfrecord_dir, 'adult.tfrecord')
+        
+        # Kept outside tfrecord_dir, where ImportExampleGen reads every file
+        tmp_file = os.path.join(self.pipeline_root, 'adult.tfrecord.tmp')
+        source_file = os.path.join(self.pipeline_root, 'adult.tfrecord.source')
+        
+        st = os.stat(self.data_filepath)
+        source_key = f"{st.st_size} {st.st_mtime_ns}"
+        
+        if os.path.exists(tfrecord_file) and os.path.exists(source_file):
+            with open(source_file) as f:
+                if f.read().strip() == source_key:
+                    self.logger.info("Reusing TFRecord examples at %s", tfrecord_dir)
+                    return tfrecord_dir
+        
+        import tensorflow as tf
+        
+        os.makedirs(tfrecord_dir, exist_ok=True)
+        
+        # Columns are assigned by position, so a header row must list them in
+        # the expected order
+        with open(self.data_filepath) as f:
+            first_row = [field.strip() for field in f.readline().split(',')]
+        has_header = any(field in CENSUS_FEATURES for field in first_row)
+        if has_header and first_row != CENSUS_COLUMNS:
+            raise ValueError(f"CSV header {first_row} does not match the expected "
+                             f"columns {CENSUS_COLUMNS}")
+        
+        def decode_batch(lines):
+            # Everything is decoded as strings so that empty fields can be left
+            # out of the examples, as CsvExampleGen does, instead of becoming 0
+            fields = tf.io.decode_csv(lines, record_defaults=[['']] * len(CENSUS_COLUMNS))
+            missing = [tf.equal(tf.strings.strip(field), '') for field in fields]
+            values = tuple(
+                tf.strings.to_number(tf.where(absent, '0', field), out_type=tf.int64)
+                if name in CENSUS_INT_COLUMNS else field
+                for name, field, absent in zip(CENSUS_COLUMNS, fields, missing)
+            )
+            return values, tf.stack(missing, axis=1)
+        
+        dataset = (
+            tf.data.TextLineDataset(self.data_filepath)
+            .skip(1 if has_header else 0)
+            .filter(lambda line: tf.strings.length(tf.strings.strip(line)) > 0)
+            .batch(CSV_BATCH_SIZE)
+            .map(decode_batch, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE)
+        )
+        
+        # One Example whose single-value feature lists are overwritten per row
+        example = tf.train.Example()
+        value_lists = []
+        for name in CENSUS_COLUMNS:
+            feature = example.features.feature[name]
+            if name in CENSUS_INT_COLUMNS:
+                feature.int64_list.value.append(0)
+                value_lists.append(feature.int64_list.value)
+            else:
+                feature.bytes_list.value.append(b'')
+                value_lists.append(feature.bytes_list.value)
+        
+        num_rows = 0
+        with tf.io.TFRecordWriter(tmp_file) as writer:
+            for values, missing in dataset:
+                columns = [column.numpy().tolist() for column in values]
+                missing = missing.numpy()
+                incomplete = set(missing.any(axis=1).nonzero()[0].tolist())
+                for i, row in enumerate(zip(*columns)):
+                    if i in incomplete:
+                        writer.write(self._census_example(row, missing[i]).SerializeToString())
+                        continue
+                    for value_list, value in zip(value_lists, row):
+                        value_list[0] = value
+                    writer.write(example.SerializeToString())
+                num_rows += len(columns[0])
+        os.replace(tmp_file, tfrecord_file)
+        
+        with open(source_file, 'w') as f:
+            f.write(source_key)
+        
+        self.logger.info("Converted %d CSV rows to TFRecord examples", num_rows)
+        return tfrecord_dir
+    
+    @staticmethod
+    def _census_example(row, missing):
+        """
+        Build a tf.train.Example for a CSV row with missing fields
+        
+        Args:
+            row: Decoded values in CENSUS_COLUMNS order
+            missing: Per-column flags for fields that were empty
+            
+        Returns:
+            tf.train.Example without the missing features
+        """
+        import tensorflow as tf
+        
+        example = tf.train.Example()
+        for name, value, absent in zip(CENSUS_COLUMNS, row, missing):
+            if absent:
+                continue
+            feature = example.features.feature[name]
+            if name in CENSUS_INT_COLUMNS:
+                feature.int64_list.value.append(value)
+            else:
+                feature.bytes_list.value.append(value)
+        return example
     
     def run_example_gen(self):
         """Run ExampleGen component"""
         self.logger.info("Running ExampleGen...")
         
+        from tfx import v1 as tfx
+        
         try:
-            example_gen = tfx.components.CsvExampleGen(input_base=self.data_root)
-            self.context.run(example_gen)
+            tfrecord_dir = self._csv_to_tfrecord()
+            example_gen = tfx.components.ImportExampleGen(input_base=tfrecord_dir)
+            self.context.run(example_gen, enable_cache=self.enable_cache)
             
             self.components['example_gen'] = example_gen
             self.logger.info("ExampleGen completed successfully")
@@ -58,18 +223,20 @@ class TFXPipeline:
             return example_gen
             
         except Exception as e:
-            self.logger.error(f"ExampleGen failed: {str(e)}")
+            self.logger.error("ExampleGen failed: %s", e)
             raise
     
     def run_statistics_gen(self, example_gen):
         """Run StatisticsGen component"""
         self.logger.info("Running StatisticsGen...")
         
+        from tfx import v1 as tfx
+        
         try:
             statistics_gen = tfx.components.StatisticsGen(
                 examples=example_gen.outputs['examples']
             )
-            self.context.run(statistics_gen)
+            self.context.run(statistics_gen, enable_cache=self.enable_cache)
             
             self.components['statistics_gen'] = statistics_gen
             self.logger.info("StatisticsGen completed successfully")
@@ -77,18 +244,20 @@ class TFXPipeline:
             return statistics_gen
             
         except Exception as e:
-            self.logger.error(f"StatisticsGen failed: {str(e)}")
+            self.logger.error("StatisticsGen failed: %s", e)
             raise
     
     def run_schema_gen(self, statistics_gen):
         """Run SchemaGen component"""
         self.logger.info("Running SchemaGen...")
         
+        from tfx import v1 as tfx
+        
         try:
             schema_gen = tfx.components.SchemaGen(
                 statistics=statistics_gen.outputs['statistics']
             )
-            self.context.run(schema_gen)
+            self.context.run(schema_gen, enable_cache=self.enable_cache)
             
             self.components['schema_gen'] = schema_gen
             self.logger.info("SchemaGen completed successfully")
@@ -96,13 +265,16 @@ class TFXPipeline:
             return schema_gen
             
         except Exception as e:
-            self.logger.error(f"SchemaGen failed: {str(e)}")
+            self.logger.error("SchemaGen failed: %s", e)
             raise
     
     def create_curated_schema(self, schema_gen):
         """Create and import curated schema"""
         self.logger.info("Creating curated schema...")
         
+        import tensorflow_data_validation as tfdv
+        from tfx import v1 as tfx
+        
         try:
             # Load the inferred schema
             schema_uri = schema_gen.outputs['schema']._artifacts[0].uri
@@ -112,10 +284,10 @@ class TFXPipeline:
             schema = self.schema_manager.customize_schema(schema)
             
             # Save curated schema
-            updated_schema_dir = os.path.join(self.pipeline_root, 'updated_schema')
-            os.makedirs(updated_schema_dir, exist_ok=True)
+            updated_schema_dir = Path(self.pipeline_root) / 'updated_schema'
+            updated_schema_dir.mkdir(parents=True, exist_ok=True)
             
-            schema_file = os.path.join(updated_schema_dir, 'schema.pbtxt')
+            schema_file = str(updated_schema_dir / 'schema.pbtxt')
             tfdv.write_schema_text(schema, schema_file)
             
             # Import curated schema
@@ -128,19 +300,21 @@ class TFXPipeline:
             return user_schema_importer
             
         except Exception as e:
-            self.logger.error(f"Schema curation failed: {str(e)}")
+            self.logger.error("Schema curation failed: %s", e)
             raise
     
     def run_example_validator(self, statistics_gen, user_schema_importer):
         """Run ExampleValidator component"""
         self.logger.info("Running ExampleValidator...")
         
+        from tfx import v1 as tfx
+        
         try:
             example_validator = tfx.components.ExampleValidator(
                 statistics=statistics_gen.outputs['statistics'],
                 schema=user_schema_importer.outputs['schema']
             )
-            self.context.run(example_validator)
+            self.context.run(example_validator, enable_cache=self.enable_cache)
             
             self.components['example_validator'] = example_validator
             self.logger.info("ExampleValidator completed successfully")
@@ -148,13 +322,75 @@ class TFXPipeline:
             return example_validator
             
         except Exception as e:
-            self.logger.error(f"ExampleValidator failed: {str(e)}")
+            self.logger.error("ExampleValidator failed: %s", e)
+            raise
+    
+    def run_local_dag_pipeline(self):
+        """
+        Run all components as one pipeline with LocalDagRunner
+        
+        Beam and driver setup happen once for the whole run instead of once
+        per component. The curated schema is produced in-DAG by
+        CuratedSchemaGen, since ImportSchemaGen needs its schema file to
+        exist before the pipeline starts. Its cache entry is keyed on a hash
+        of the customization code, so edits to SchemaManager are picked up.
+        """
+        self.logger.info("Running pipeline with LocalDagRunner...")
+        
+        from tfx import v1 as tfx
+        from .schema_components import CuratedSchemaGen, customization_fingerprint
+        
+        try:
+            tfrecord_dir = self._csv_to_tfrecord()
+            example_gen = tfx.components.ImportExampleGen(input_base=tfrecord_dir)
+            statistics_gen = tfx.components.StatisticsGen(
+                examples=example_gen.outputs['examples']
+            )
+            schema_gen = tfx.components.SchemaGen(
+                statistics=statistics_gen.outputs['statistics']
+            )
+            curated_schema_gen = CuratedSchemaGen(
+                schema=schema_gen.outputs['schema'],
+                fingerprint=customization_fingerprint()
+            )
+            example_validator = tfx.components.ExampleValidator(
+                statistics=statistics_gen.outputs['statistics'],
+                schema=curated_schema_gen.outputs['curated_schema']
+            )
+            
+            components = {
+                'example_gen': example_gen,
+                'statistics_gen': statistics_gen,
+                'schema_gen': schema_gen,
+                'curated_schema_gen': curated_schema_gen,
+                'example_validator': example_validator
+            }
+            
+            pipeline = tfx.dsl.Pipeline(
+                pipeline_name=LOCAL_DAG_PIPELINE_NAME,
+                pipeline_root=self.pipeline_root,
+                components=list(components.values()),
+                enable_cache=self.enable_cache,
+                metadata_connection_config=self.context.metadata_connection_config,
+                beam_pipeline_args=self.beam_pipeline_args
+            )
+            tfx.orchestration.LocalDagRunner().run(pipeline)
+            
+            self.components.update(components)
+            self.logger.info("LocalDagRunner pipeline completed successfully")
+            
+        except Exception as e:
+            self.logger.error("LocalDagRunner pipeline failed: %s", e)
             raise
     
     def run_full_pipeline(self):
         """Run the complete TFX pipeline"""
         self.logger.info("Starting full TFX pipeline execution...")
         
+        if self.use_local_dag_runner:
+            self.run_local_dag_pipeline()
+            return
+        
         try:
             # Step 1: ExampleGen
             example_gen = self.run_example_gen()
@@ -174,24 +410,47 @@ class TFXPipeline:
             self.logger.info("Full pipeline execution completed successfully!")
             
         except Exception as e:
-            self.logger.error(f"Full pipeline execution failed: {str(e)}")
+            self.logger.error("Full pipeline execution failed: %s", e)
             raise
     
+    def _show(self, channel):
+        """
+        Show a component output
+        
+        Rich visualization is only rendered inside a notebook; on the
+        command line a brief summary of the output artifacts is printed.
+        
+        Args:
+            channel: Output channel of a component
+        """
+        if _in_notebook():
+            self.context.show(channel)
+            return
+        
+        for artifact in channel.get():
+            print(f"{artifact.type_name} artifact {artifact.id}: {artifact.uri}")
+    
     def display_results(self):
         """Display pipeline results"""
         self.logger.info("Displaying pipeline results...")
         
+        if self.use_local_dag_runner:
+            # Channels are not populated outside the interactive context
+            self.logger.info("Results are recorded in ML Metadata; "
+                             "see demonstrate_metadata_tracking()")
+            return
+        
         try:
             if 'user_schema_importer' in self.components:
                 print("\n=== CURATED SCHEMA ===")
-                self.context.show(self.components['user_schema_importer'].outputs['schema'])
+                self._show(self.components['user_schema_importer'].outputs['schema'])
             
             if 'example_validator' in self.components:
                 print("\n=== VALIDATION RESULTS ===")
-                self.context.show(self.components['example_validator'].outputs['anomalies'])
+                self._show(self.components['example_validator'].outputs['anomalies'])
                 
         except Exception as e:
-            self.logger.error(f"Failed to display results: {str(e)}")
+            self.logger.error("Failed to display results: %s", e)
     
     def demonstrate_metadata_tracking(self):
         """Demonstrate metadata tracking capabilities"""
@@ -214,7 +473,7 @@ class TFXPipeline:
                     print(f"  Schema {i+1}: URI={schema['uri']}, ID={schema['id']}")
             
         except Exception as e:
-            self.logger.error(f"Metadata tracking demonstration failed: {str(e)}")
+            self.logger.error("Metadata tracking demonstration failed: %s", e)
     
     def get_component(self, component_name):
         """Get a specific component by name"""
@@ -4,9 +4,18 @@ Handles ML Metadata exploration and artifact lineage tracking
 """
 
 import logging
+import os
+import re
+import sqlite3
+import sys
+from collections import Counter
+from pathlib import Path
 import ml_metadata as mlmd
 from ml_metadata.proto import metadata_store_pb2
 
+# URI patterns that can be embedded in an MLMD filter query as-is
+_SAFE_URI_PATTERN = re.compile(r'[\w./:-]+')
+
 class MetadataTracker:
     """Tracks and explores ML Metadata"""
     
@@ -20,33 +29,117 @@ class MetadataTracker:
         self.context = context
         self.logger = logging.getLogger(__name__)
         
+        # Artifact types rarely change within a session; fetched lazily
+        self._artifact_types = None
+        
         # Setup metadata store connection
         try:
             connection_config = context.metadata_connection_config
             self.store = mlmd.MetadataStore(connection_config)
             self.logger.info("Metadata store connection established")
         except Exception as e:
-            self.logger.error(f"Failed to connect to metadata store: {str(e)}")
+            self.logger.error("Failed to connect to metadata store: %s", e)
             raise
+        
+        self._enable_sqlite_wal()
+    
+    def _get_sqlite_path(self):
+        """
+        Get the SQLite database file backing the metadata store
+        
+        Returns:
+            Path to the database file, or None if the store is not a SQLite file
+        """
+        connection_config = self.context.metadata_connection_config
+        if not connection_config.HasField('sqlite'):
+            return None
+        
+        filename = connection_config.sqlite.filename_uri
+        if not filename or filename == ':memory:' or not os.path.exists(filename):
+            return None
+        return filename
+    
+    def _enable_sqlite_wal(self):
+        """
+        Switch a SQLite metadata store to write-ahead logging
+        
+        WAL lets readers proceed while a writer is active and avoids the
+        rollback journal on every write. The journal mode is stored in the
+        database file, so it also applies to MLMD's own connection.
+        """
+        sqlite_path = self._get_sqlite_path()
+        if sqlite_path is None:
+            return
+        
+        try:
+            conn = sqlite3.connect(sqlite_path)
+            try:
+                journal_mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+            finally:
+                conn.close()
+            self.logger.info("Metadata store journal mode: %s", journal_mode)
+        except sqlite3.Error as e:
+            self.logger.warning("Could not enable WAL for metadata store: %s", e)
+    
+    def _fetch_artifact_types(self, refresh=False):
+        """
+        Get artifact type protos, querying the store only when not cached
+        
+        Args:
+            refresh: Bypass the cache and query the store again
+            
+        Returns:
+            List of ArtifactType protos
+        """
+        if refresh or self._artifact_types is None:
+            self._artifact_types = self.store.get_artifact_types()
+        return self._artifact_types
     
-    def get_artifact_types(self):
+    def get_artifact_types(self, refresh=False):
         """
         Get all artifact types from metadata store
         
+        Args:
+            refresh: Bypass the cached types and query the store again
+            
         Returns:
             List of artifact type names
         """
         try:
-            artifact_types = self.store.get_artifact_types()
+            artifact_types = self._fetch_artifact_types(refresh=refresh)
             type_names = [artifact_type.name for artifact_type in artifact_types]
             
-            self.logger.info(f"Found {len(type_names)} artifact types")
+            self.logger.info("Found %d artifact types", len(type_names))
             return type_names
             
         except Exception as e:
-            self.logger.error(f"Failed to get artifact types: {str(e)}")
+            self.logger.error("Failed to get artifact types: %s", e)
             return []
     
+    def _get_artifact_type_map(self, type_ids=()):
+        """
+        Map artifact type IDs to type names
+        
+        The cached types are refreshed if any of the given type IDs was
+        registered after they were fetched.
+        
+        Args:
+            type_ids: Type IDs that must be present in the map
+            
+        Returns:
+            Dictionary of type ID to type name
+        """
+        type_names = {
+            artifact_type.id: artifact_type.name
+            for artifact_type in self._fetch_artifact_types()
+        }
+        if any(type_id not in type_names for type_id in type_ids):
+            type_names = {
+                artifact_type.id: artifact_type.name
+                for artifact_type in self._fetch_artifact_types(refresh=True)
+            }
+        return type_names
+    
     def get_schema_artifacts(self):
         """
         Get all Schema artifacts from metadata store
@@ -61,11 +154,11 @@ class MetadataTracker:
                 for schema in schema_list
             ]
             
-            self.logger.info(f"Found {len(schema_info)} Schema artifacts")
+            self.logger.info("Found %d Schema artifacts", len(schema_info))
             return schema_info
             
         except Exception as e:
-            self.logger.error(f"Failed to get schema artifacts: {str(e)}")
+            self.logger.error("Failed to get schema artifacts: %s", e)
             return []
     
     def get_example_anomalies_artifacts(self):
@@ -77,13 +170,62 @@ class MetadataTracker:
         """
         try:
             anomalies_list = self.store.get_artifacts_by_type('ExampleAnomalies')
-            self.logger.info(f"Found {len(anomalies_list)} ExampleAnomalies artifacts")
+            self.logger.info("Found %d ExampleAnomalies artifacts", len(anomalies_list))
             return anomalies_list
             
         except Exception as e:
-            self.logger.error(f"Failed to get ExampleAnomalies artifacts: {str(e)}")
+            self.logger.error("Failed to get ExampleAnomalies artifacts: %s", e)
             return []
     
+    def _get_lineage_events(self, artifact_id):
+        """
+        Get the events of the execution that produced an artifact
+        
+        Uses a single lineage subgraph query where the metadata store
+        supports it, and falls back to separate artifact and execution
+        event queries otherwise.
+        
+        Args:
+            artifact_id: ID of the artifact to track
+            
+        Returns:
+            Tuple of (execution ID, list of execution events), or None
+        """
+        try:
+            query_options = metadata_store_pb2.LineageSubgraphQueryOptions(
+                starting_artifacts=metadata_store_pb2.LineageSubgraphQueryOptions.StartingNodes(
+                    filter_query=f'id = {int(artifact_id)}'
+                ),
+                max_num_hops=2,
+                direction=metadata_store_pb2.LineageSubgraphQueryOptions.BIDIRECTIONAL
+            )
+            lineage_graph = self.store.get_lineage_subgraph(query_options)
+            events = sorted(lineage_graph.events, key=lambda event: event.milliseconds_since_epoch)
+        except Exception as e:
+            # Older MLMD versions without lineage subgraph support
+            self.logger.debug("Lineage subgraph query unavailable: %s", e)
+            events = None
+        
+        if events is not None:
+            artifact_events = [event for event in events if event.artifact_id == artifact_id]
+            if not artifact_events:
+                return None
+            execution_id = artifact_events[0].execution_id
+            execution_events = [event for event in events if event.execution_id == execution_id]
+            return execution_id, execution_events
+        
+        # Get events for the artifact
+        events = self.store.get_events_by_artifact_ids([artifact_id])
+        if not events:
+            return None
+        
+        # Get the first event (should be OUTPUT event)
+        execution_id = events[0].execution_id
+        
+        # Get all events for this execution
+        execution_events = self.store.get_events_by_execution_ids([execution_id])
+        return execution_id, execution_events
+    
     def track_artifact_lineage(self, artifact_id):
         """
         Track the lineage of a specific artifact
@@ -95,19 +237,13 @@ class MetadataTracker:
             Dictionary containing lineage information
         """
         try:
-            # Get events for the artifact
-            events = self.store.get_events_by_artifact_ids([artifact_id])
+            lineage_events = self._get_lineage_events(artifact_id)
             
-            if not events:
-                self.logger.warning(f"No events found for artifact ID: {artifact_id}")
+            if not lineage_events:
+                self.logger.warning("No events found for artifact ID: %s", artifact_id)
                 return None
             
-            # Get the first event (should be OUTPUT event)
-            first_event = events[0]
-            execution_id = first_event.execution_id
-            
-            # Get all events for this execution
-            execution_events = self.store.get_events_by_execution_ids([execution_id])
+            execution_id, execution_events = lineage_events
             
             # Separate inputs and outputs
             input_artifacts = [
@@ -127,11 +263,11 @@ class MetadataTracker:
                 'output_ids': output_artifacts
             }
             
-            self.logger.info(f"Tracked lineage for artifact {artifact_id}")
+            self.logger.info("Tracked lineage for artifact %s", artifact_id)
             return lineage_info
             
         except Exception as e:
-            self.logger.error(f"Failed to track artifact lineage: {str(e)}")
+            self.logger.error("Failed to track artifact lineage: %s", e)
             return None
     
     def track_example_anomalies_lineage(self):
@@ -156,7 +292,7 @@ class MetadataTracker:
             return lineage_info
             
         except Exception as e:
-            self.logger.error(f"Failed to track ExampleAnomalies lineage: {str(e)}")
+            self.logger.error("Failed to track ExampleAnomalies lineage: %s", e)
             return None
     
     def get_execution_info(self, execution_id):
@@ -173,7 +309,7 @@ class MetadataTracker:
             executions = self.store.get_executions_by_id([execution_id])
             
             if not executions:
-                self.logger.warning(f"No execution found with ID: {execution_id}")
+                self.logger.warning("No execution found with ID: %s", execution_id)
                 return None
             
             execution = executions[0]
@@ -185,32 +321,70 @@ class MetadataTracker:
                 'properties': dict(execution.properties) if execution.properties else {}
             }
             
-            self.logger.info(f"Retrieved execution info for ID: {execution_id}")
+            self.logger.info("Retrieved execution info for ID: %s", execution_id)
             return execution_info
             
         except Exception as e:
-            self.logger.error(f"Failed to get execution info: {str(e)}")
+            self.logger.error("Failed to get execution info: %s", e)
             return None
     
+    def _count_artifacts_by_type_id(self):
+        """
+        Count artifacts per type ID
+        
+        For a SQLite metadata store the counts are aggregated by a single
+        GROUP BY query on a read-only connection, without transferring the
+        artifacts themselves. Other stores fall back to fetching all
+        artifacts and counting them locally.
+        
+        Returns:
+            Counter of type ID to number of artifacts
+        """
+        sqlite_path = self._get_sqlite_path()
+        if sqlite_path is not None:
+            try:
+                read_only_uri = Path(sqlite_path).resolve().as_uri() + '?mode=ro'
+                conn = sqlite3.connect(read_only_uri, uri=True)
+                try:
+                    rows = conn.execute(
+                        'SELECT type_id, COUNT(1) FROM Artifact GROUP BY type_id'
+                    ).fetchall()
+                finally:
+                    conn.close()
+                return Counter(dict(rows))
+            except sqlite3.Error as e:
+                self.logger.debug("SQL artifact count failed, counting locally: %s", e)
+        
+        return Counter(artifact.type_id for artifact in self.store.get_artifacts())
+    
     def display_artifact_summary(self):
         """Display a summary of all artifacts in the metadata store"""
         try:
-            print("\n=== METADATA STORE SUMMARY ===")
+            # Collect output lines and write them in one call
+            lines = ["\n=== METADATA STORE SUMMARY ==="]
+            
+            # Count artifacts per type with a single query
+            type_id_counts = self._count_artifacts_by_type_id()
             
             # Get artifact types
+            type_names = self._get_artifact_type_map(type_id_counts)
             artifact_types = self.get_artifact_types()
-            print(f"Artifact Types: {artifact_types}")
+            lines.append(f"Artifact Types: {artifact_types}")
             
             # Count artifacts by type
-            for artifact_type in artifact_types:
-                try:
-                    artifacts = self.store.get_artifacts_by_type(artifact_type)
-                    print(f"  {artifact_type}: {len(artifacts)} artifacts")
-                except:
-                    print(f"  {artifact_type}: Unable to count")
+            try:
+                counts = Counter()
+                for type_id, count in type_id_counts.items():
+                    counts[type_names.get(type_id)] += count
+                for artifact_type in artifact_types:
+                    lines.append(f"  {artifact_type}: {counts[artifact_type]} artifacts")
+            except:
+                lines.append("  Unable to count artifacts")
+            
+            sys.stdout.write("\n".join(lines) + "\n")
             
         except Exception as e:
-            self.logger.error(f"Failed to display artifact summary: {str(e)}")
+            self.logger.error("Failed to display artifact summary: %s", e)
     
     def display_lineage_graph(self, artifact_id):
         """
@@ -226,17 +400,42 @@ class MetadataTracker:
                 print(f"No lineage information found for artifact {artifact_id}")
                 return
             
-            print(f"\n=== LINEAGE GRAPH FOR ARTIFACT {artifact_id} ===")
-            print(f"Execution ID: {lineage['execution_id']}")
-            print("Inputs:")
-            for input_id in lineage['input_ids']:
-                print(f"  └── Artifact {input_id}")
-            print("Outputs:")
-            for output_id in lineage['output_ids']:
-                print(f"  └── Artifact {output_id}")
+            # Collect output lines and write them in one call
+            lines = [
+                f"\n=== LINEAGE GRAPH FOR ARTIFACT {artifact_id} ===",
+                f"Execution ID: {lineage['execution_id']}",
+                "Inputs:"
+            ]
+            lines.extend(f"  └── Artifact {input_id}" for input_id in lineage['input_ids'])
+            lines.append("Outputs:")
+            lines.extend(f"  └── Artifact {output_id}" for output_id in lineage['output_ids'])
+            sys.stdout.write("\n".join(lines) + "\n")
             
         except Exception as e:
-            self.logger.error(f"Failed to display lineage graph: {str(e)}")
+            self.logger.error("Failed to display lineage graph: %s", e)
+    
+    def _query_artifacts_by_uri(self, pattern):
+        """
+        Query artifacts whose URI contains a pattern
+        
+        The filter is evaluated by the metadata store when the pattern is
+        safe to embed in a filter query and the store supports it;
+        otherwise all artifacts are fetched and filtered locally.
+        
+        Args:
+            pattern: Pattern to match in URI
+            
+        Returns:
+            List of artifacts, possibly including false positives
+        """
+        if _SAFE_URI_PATTERN.fullmatch(pattern):
+            try:
+                list_options = mlmd.ListOptions(filter_query=f"uri LIKE '%{pattern}%'")
+                return self.store.get_artifacts(list_options=list_options)
+            except Exception as e:
+                self.logger.debug("Filter query not supported, filtering locally: %s", e)
+        
+        return self.store.get_artifacts()
     
     def find_artifacts_by_uri_pattern(self, pattern):
         """
@@ -249,25 +448,24 @@ class MetadataTracker:
             List of matching artifacts
         """
         try:
-            all_artifacts = []
-            artifact_types = self.get_artifact_types()
+            # Re-check locally since '_' is a single-character wildcard in LIKE
+            artifacts = [
+                artifact for artifact in self._query_artifacts_by_uri(pattern)
+                if pattern in artifact.uri
+            ]
+            type_names = self._get_artifact_type_map(artifact.type_id for artifact in artifacts)
+            all_artifacts = [
+                {
+                    'id': artifact.id,
+                    'type': type_names.get(artifact.type_id),
+                    'uri': artifact.uri
+                }
+                for artifact in artifacts
+            ]
             
-            for artifact_type in artifact_types:
-                try:
-                    artifacts = self.store.get_artifacts_by_type(artifact_type)
-                    for artifact in artifacts:
-                        if pattern in artifact.uri:
-                            all_artifacts.append({
-                                'id': artifact.id,
-                                'type': artifact_type,
-                                'uri': artifact.uri
-                            })
-                except:
-                    continue
-            
-            self.logger.info(f"Found {len(all_artifacts)} artifacts matching pattern '{pattern}'")
+            self.logger.info("Found %d artifacts matching pattern '%s'", len(all_artifacts), pattern)
             return all_artifacts
             
         except Exception as e:
-            self.logger.error(f"Failed to find artifacts by URI pattern: {str(e)}")
+            self.logger.error("Failed to find artifacts by URI pattern: %s", e)
             return []
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Custom TFX components for the schema lab
+Used when the pipeline runs as a single DAG instead of interactively
+"""
+
+import os
+import hashlib
+import inspect
+import tensorflow_data_validation as tfdv
+
+from tfx import v1 as tfx
+
+from .schema_manager import SchemaManager
+
+def customization_fingerprint():
+    """
+    Hash the source of the schema customization code
+    
+    The component cache key only covers this module's function, not the
+    SchemaManager code it calls, so the hash is passed in as a parameter.
+    
+    Returns:
+        str: Hex digest of this module and the schema_manager module
+    """
+    digest = hashlib.sha256()
+    for path in (__file__, inspect.getfile(SchemaManager)):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+@tfx.dsl.components.component
+def CuratedSchemaGen(
+    schema: tfx.dsl.components.InputArtifact[tfx.types.standard_artifacts.Schema],
+    curated_schema: tfx.dsl.components.OutputArtifact[tfx.types.standard_artifacts.Schema],
+    fingerprint: tfx.dsl.components.Parameter[str] = ''
+):
+    """
+    Apply the SchemaManager customizations to an inferred schema
+    
+    In-DAG counterpart of writing a curated schema file and importing it
+    with ImportSchemaGen, which needs the file before the pipeline starts.
+    
+    Args:
+        schema: Schema artifact produced by SchemaGen
+        curated_schema: Curated Schema artifact to write
+        fingerprint: customization_fingerprint() of the running code, so a
+            cached result is not reused after the customizations change
+    """
+    inferred_schema = tfdv.load_schema_text(os.path.join(schema.uri, 'schema.pbtxt'))
+    curated = SchemaManager().customize_schema(inferred_schema)
+    tfdv.write_schema_text(curated, os.path.join(curated_schema.uri, 'schema.pbtxt'))
\ No newline at end of file
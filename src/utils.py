@@ -3,60 +3,201 @@ Utility functions for TFX Pipeline
 """
 
 import os
+import re
+import sys
+import math
+import queue
+import atexit
+import shutil
 import logging
-from pathlib import Path
+import logging.handlers
+import contextlib
+import urllib.error
+import urllib.request
+from functools import lru_cache
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
-def setup_logging(level=logging.INFO):
+_LOG = logging.getLogger(__name__)
+
+# urllib3 is optional; downloads fall back to urllib.request without it
+try:
+    import urllib3
+except ImportError:
+    urllib3 = None
+
+# Shared connection pool so repeated downloads reuse HTTPS connections
+if urllib3 is not None:
+    _POOL = urllib3.PoolManager(maxsize=4, retries=urllib3.Retry(3, backoff_factor=0.2))
+else:
+    _POOL = None
+
+# Set once setup_logging has installed its handlers
+_CONFIGURED = False
+
+# QueueListener started by setup_logging
+_LISTENER = None
+
+def _stop_listener():
+    """Flush and stop the logging listener thread and close its handlers"""
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        # stop() leaves the handlers (and the log file) open
+        for handler in _LISTENER.handlers:
+            handler.close()
+        _LISTENER = None
+
+atexit.register(_stop_listener)
+
+def setup_logging(level=logging.INFO, force=False):
     """
     Setup logging configuration
     
+    Records are also written to tfx_pipeline.log unless the TFX_LOG_FILE
+    environment variable is set to something other than '1'. Later calls
+    only update the root logger level.
+    
     Args:
         level: Logging level (default: INFO)
+        force: Remove the existing handlers and configure logging again
     """
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('tfx_pipeline.log')
-        ]
+    global _CONFIGURED, _LISTENER
+    root = logging.getLogger()
+    if _CONFIGURED and not force:
+        root.setLevel(level)
+        return
+    
+    if force:
+        _stop_listener()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+    
+    # An explicit datefmt skips the per-record millisecond formatting
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
     )
+    handlers = [logging.StreamHandler()]
+    if os.environ.get('TFX_LOG_FILE', '1') == '1':
+        handlers.append(logging.FileHandler('tfx_pipeline.log'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    # Callers only enqueue records; a background thread does the writes
+    log_queue = queue.Queue(-1)
+    _LISTENER = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _LISTENER.start()
+    
+    # Only merge the message here; the listener's handlers apply the full format
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
+    logging.basicConfig(level=level, handlers=[queue_handler])
+    _CONFIGURED = True
+
+# Absolute paths of directories create_directories has already made
+_KNOWN_DIRS = set()
 
 def create_directories(directories):
     """
     Create directories if they don't exist
     
+    Directories created earlier in the process only need an isdir check.
+    
     Args:
         directories: List of directory paths to create
     """
-    for directory in directories:
-        Path(directory).mkdir(parents=True, exist_ok=True)
+    # A known directory is still checked, since it may have been removed
+    # by something other than clean_directory
+    paths = {os.path.abspath(os.fspath(directory)) for directory in directories}
+    missing = {d for d in paths if d not in _KNOWN_DIRS or not os.path.isdir(d)}
+    
+    # Sorting by path components places each directory right before its
+    # descendants; creating a descendant also creates its ancestors
+    dirs = sorted(missing, key=lambda d: d.split(os.sep))
+    for i, directory in enumerate(dirs):
+        if i + 1 < len(dirs) and dirs[i + 1].startswith(directory + os.sep):
+            continue
+        os.makedirs(directory, exist_ok=True)
+    _KNOWN_DIRS.update(dirs)
 
-def validate_data_file(filepath):
+@dataclass(frozen=True)
+class FileInfo:
+    """Validity and size of a data file from a single stat"""
+    ok: bool
+    size_bytes: int
+    
+    @property
+    def size_mb(self):
+        """File size in MB"""
+        return self.size_bytes / (1024 * 1024)
+
+_MISSING_FILE = FileInfo(ok=False, size_bytes=0)
+
+# inspect_data_file results keyed by path, with the stat fields they depend on
+_INSPECTION_CACHE = {}
+
+def inspect_data_file(filepath):
     """
-    Validate that a data file exists and is readable
+    Check that a data file is valid and get its size with one stat
     
     Args:
         filepath: Path to the data file
         
     Returns:
-        bool: True if valid, False otherwise
+        FileInfo: ok is True if the file is non-empty and readable
     """
     try:
-        if not os.path.exists(filepath):
-            return False
+        # Cheap rejection of missing files without filling a stat buffer
+        if not os.access(filepath, os.F_OK):
+            return _MISSING_FILE
         
-        if not os.access(filepath, os.R_OK):
-            return False
+        st = os.stat(filepath)
         
-        # Check if file is not empty
-        if os.path.getsize(filepath) == 0:
-            return False
+        # Reuse the previous result while the file is unchanged
+        key = (st.st_mtime_ns, st.st_ctime_ns, st.st_size)
+        cached = _INSPECTION_CACHE.get(filepath)
+        if cached is not None and cached[0] == key:
+            return cached[1]
         
-        return True
+        # Check that the file is not empty and is readable
+        ok = st.st_size > 0 and os.access(filepath, os.R_OK)
+        info = FileInfo(ok=ok, size_bytes=st.st_size)
+        _INSPECTION_CACHE[filepath] = (key, info)
+        return info
         
     except Exception:
-        return False
+        return _MISSING_FILE
+
+inspect_data_file.cache_clear = _INSPECTION_CACHE.clear
+
+def validate_data_file(filepath):
+    """
+    Validate that a data file exists and is readable
+    
+    Args:
+        filepath: Path to the data file
+        
+    Returns:
+        bool: True if valid, False otherwise
+    """
+    return inspect_data_file(filepath).ok
+
+validate_data_file.cache_clear = _INSPECTION_CACHE.clear
+
+def get_file_size(filepath):
+    """
+    Get file size in bytes
+    
+    Args:
+        filepath: Path to the file
+        
+    Returns:
+        int: File size in bytes, 0 if it cannot be read
+    """
+    return inspect_data_file(filepath).size_bytes
 
 def get_file_size_mb(filepath):
     """
@@ -68,11 +209,7 @@ def get_file_size_mb(filepath):
     Returns:
         float: File size in MB
     """
-    try:
-        size_bytes = os.path.getsize(filepath)
-        return size_bytes / (1024 * 1024)
-    except Exception:
-        return 0.0
+    return get_file_size(filepath) / (1 << 20)
 
 def clean_directory(directory, keep_files=None):
     """
@@ -82,21 +219,33 @@ def clean_directory(directory, keep_files=None):
         directory: Directory to clean
         keep_files: List of files to keep (optional)
     """
-    if keep_files is None:
-        keep_files = []
+    keep_set = frozenset(keep_files or ())
+    
+    # Subdirectories may be removed below, so they must be created again
+    prefix = os.path.join(os.path.abspath(directory), '')
+    _KNOWN_DIRS.difference_update([d for d in _KNOWN_DIRS if d.startswith(prefix)])
     
     try:
         if os.path.exists(directory):
-            for filename in os.listdir(directory):
-                if filename not in keep_files:
-                    filepath = os.path.join(directory, filename)
-                    if os.path.isfile(filepath):
-                        os.remove(filepath)
-                    elif os.path.isdir(filepath):
-                        import shutil
-                        shutil.rmtree(filepath)
+            # DirEntry type checks reuse the readdir result instead of a stat per entry.
+            # Subtrees are removed on worker threads while files are unlinked here
+            workers = min(8, os.cpu_count() or 2)
+            with os.scandir(directory) as entries, ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = []
+                for entry in entries:
+                    if entry.name in keep_set:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        futures.append(executor.submit(shutil.rmtree, entry.path))
+                    else:
+                        os.unlink(entry.path)
+                # Re-raise the first removal error
+                for future in futures:
+                    future.result()
     except Exception as e:
-        logging.getLogger(__name__).error(f"Failed to clean directory {directory}: {str(e)}")
+        _LOG.error("Failed to clean directory %s: %s", directory, e)
+
+_BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
 
 def format_bytes(bytes_value):
     """
@@ -108,11 +257,22 @@ def format_bytes(bytes_value):
     Returns:
         str: Formatted string (e.g., "1.5 MB")
     """
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if bytes_value < 1024.0:
-            return f"{bytes_value:.1f} {unit}"
-        bytes_value /= 1024.0
-    return f"{bytes_value:.1f} PB"
+    if bytes_value < 1024:
+        return f"{bytes_value:.1f} B"
+    
+    # inf and nan have no bit length; they end up in the largest unit
+    if isinstance(bytes_value, float) and not math.isfinite(bytes_value):
+        return f"{bytes_value:.1f} {_BYTE_UNITS[-1]}"
+    
+    # Each unit is 2**10 times the previous one, so the unit index is
+    # (bit length - 1) // 10, capped at PB
+    idx = min(len(_BYTE_UNITS) - 1, (int(bytes_value).bit_length() - 1) // 10)
+    return f"{bytes_value / (1 << (10 * idx)):.1f} {_BYTE_UNITS[idx]}"
+
+@lru_cache(maxsize=8)
+def _bar(width, char='='):
+    """Return a separator line, reused across calls with the same width"""
+    return char * width
 
 def print_section_header(title, width=60):
     """
@@ -122,9 +282,8 @@ def print_section_header(title, width=60):
         title: Title of the section
         width: Width of the header line
     """
-    print("\n" + "=" * width)
-    print(f" {title} ")
-    print("=" * width)
+    bar = _bar(width)
+    sys.stdout.write(f"\n{bar}\n {title} \n{bar}\n")
 
 def print_step_info(step_number, step_name, description=""):
     """
@@ -135,32 +294,250 @@ def print_step_info(step_number, step_name, description=""):
         step_name: Name of the step
         description: Optional description
     """
-    print(f"\n>>> Step {step_number}: {step_name}")
+    buf = f"\n>>> Step {step_number}: {step_name}\n"
     if description:
-        print(f"    {description}")
+        buf += f"    {description}\n"
+    sys.stdout.write(buf)
+
+@contextlib.contextmanager
+def _open_url(url, headers=None):
+    """
+    Open a streaming HTTP GET request
+    
+    Uses the shared urllib3 pool when available, otherwise urllib.request.
+    
+    Args:
+        url: URL to request
+        headers: Optional request headers
+        
+    Yields:
+        Tuple of (HTTP status code, file-like response)
+    """
+    if _POOL is not None:
+        # A short body is reported by _copy_to_fd after keeping what arrived;
+        # urllib3 2.x would otherwise raise and drop the bytes of that read
+        resp = _POOL.request('GET', url, headers=headers, preload_content=False,
+                             enforce_content_length=False)
+        try:
+            yield resp.status, resp
+        finally:
+            resp.release_conn()
+        return
+    
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        resp = urllib.request.urlopen(request)
+        status = resp.status
+    except urllib.error.HTTPError as e:
+        resp, status = e, e.code
+    with resp:
+        yield status, resp
+
+# Largest response body read into a single preallocated buffer
+_PREALLOC_LIMIT = 64 << 20
+
+def _write_all(fd, data):
+    """Write a bytes-like object to a file descriptor, retrying short writes"""
+    view = memoryview(data)
+    written = 0
+    while written < len(view):
+        written += os.write(fd, view[written:])
+
+def _copy_to_fd(resp, fd, length=None, chunk_size=1 << 20):
+    """
+    Copy a response body to a file descriptor
+    
+    A body of known length up to _PREALLOC_LIMIT is read into one buffer
+    in chunk_size slices and written with a single write; otherwise it is
+    streamed through a reused chunk_size buffer. Reads are bounded because
+    urllib3 copies each one through a temporary bytes object of that size.
+    
+    Args:
+        resp: File-like response supporting readinto
+        fd: File descriptor open for writing
+        length: Expected body length in bytes, if known
+        chunk_size: Read size in bytes
+        
+    Raises:
+        IOError: If the body ends before length bytes
+    """
+    received = 0
+    if length is not None and length <= _PREALLOC_LIMIT:
+        buf = bytearray(length)
+        view = memoryview(buf)
+        try:
+            while received < length:
+                n = resp.readinto(view[received:received + chunk_size])
+                if not n:
+                    break
+                received += n
+        finally:
+            # Keep what arrived so an interrupted download can be resumed,
+            # also when the read raises instead of returning 0 (urllib3)
+            _write_all(fd, view[:received])
+    else:
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            n = resp.readinto(buf)
+            if not n:
+                break
+            _write_all(fd, view[:n])
+            received += n
+    
+    if length is not None and received < length:
+        raise IOError(f"Connection closed after {received} of {length} bytes")
+
+def _read_sidecar(path):
+    """Read a one-line sidecar file, returning None if it is missing or empty"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+def _write_sidecar(path, value):
+    """Write a one-line sidecar file, or remove it when value is empty"""
+    if value:
+        with open(path, 'w') as f:
+            f.write(value)
+    elif os.path.exists(path):
+        os.remove(path)
 
-def download_census_data(data_root):
+def _remove_files(paths):
+    """Remove the files that exist among paths"""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)')
+
+def _parse_content_range(value):
+    """
+    Parse a Content-Range response header
+    
+    Args:
+        value: Header value, e.g. "bytes 100-199/200" or "bytes */200"
+        
+    Returns:
+        Tuple of (first byte position, complete length), each None if unknown
+    """
+    match = _CONTENT_RANGE.match(value or '')
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start else None,
+            int(total) if total != '*' else None)
+
+def download_census_data(data_root, revalidate=False):
     """
     Download Census Income dataset if not present
     
+    An interrupted download is resumed from its partial file with an HTTP
+    Range request, also when revalidating an existing file, as long as the
+    partial file's ETag or Last-Modified date was recorded. The server's
+    ETag is stored next to the data file once it is complete, so an
+    existing file can be revalidated without downloading it again.
+    
     Args:
         data_root: Directory to save the data
+        revalidate: Check an existing file against the server copy and
+            download it again only if it changed (default: False)
     """
-    import urllib.request
-    
     data_url = "https://archive.ics.uci.edu/ml/machine-learning-databases/adult/adult.data"
     data_file = os.path.join(data_root, "adult.data")
     
-    if not os.path.exists(data_file):
-        print(f"Downloading Census Income dataset to {data_file}...")
-        try:
-            os.makedirs(data_root, exist_ok=True)
-            urllib.request.urlretrieve(data_url, data_file)
-            print(f"Dataset downloaded successfully!")
-            return True
-        except Exception as e:
-            print(f"Failed to download dataset: {str(e)}")
-            return False
-    else:
+    if os.path.exists(data_file) and not revalidate:
         print(f"Dataset already exists at {data_file}")
-        return True
\ No newline at end of file
+        return True
+    
+    print(f"Downloading Census Income dataset to {data_file}...")
+    try:
+        os.makedirs(data_root, exist_ok=True)
+        
+        # Stream to a temporary file so an interrupted download never
+        # leaves a partial file at the final path
+        tmp_file = data_file + '.tmp'
+        
+        # Each validator sidecar describes the file it is named after; the
+        # partial download's ETag only becomes the data file's once it is complete
+        etag_file = data_file + '.etag'
+        tmp_etag_file = tmp_file + '.etag'
+        tmp_modified_file = tmp_file + '.last-modified'
+        tmp_files = (tmp_file, tmp_etag_file, tmp_modified_file)
+        
+        partial_size = os.path.getsize(tmp_file) if os.path.exists(tmp_file) else 0
+        validator = None
+        if partial_size:
+            validator = _read_sidecar(tmp_etag_file) or _read_sidecar(tmp_modified_file)
+            if not validator:
+                # Without a validator a changed server copy would be appended
+                # to the old prefix, so start over
+                _remove_files(tmp_files)
+                partial_size = 0
+        
+        headers = {'Accept-Encoding': 'identity'}
+        if partial_size:
+            # Resume the partial download; If-Range restarts it if the file changed
+            headers['Range'] = f'bytes={partial_size}-'
+            headers['If-Range'] = validator
+        elif os.path.exists(data_file):
+            etag = _read_sidecar(etag_file)
+            if etag:
+                headers['If-None-Match'] = etag
+        
+        with _open_url(data_url, headers) as (status, resp):
+            if status == 304:
+                print(f"Dataset at {data_file} is up to date")
+                return True
+            if status == 416:
+                # A run stopped between the last write and os.replace leaves
+                # a complete partial file, which only needs to be moved
+                _, total = _parse_content_range(resp.headers.get('Content-Range'))
+                if total != partial_size:
+                    _remove_files(tmp_files)
+                    raise IOError("Partial download does not match the server copy and was discarded")
+            elif status in (200, 206):
+                if status == 206:
+                    start, _ = _parse_content_range(resp.headers.get('Content-Range'))
+                    if start != partial_size:
+                        _remove_files(tmp_files)
+                        raise IOError(f"Server resumed at byte {start} instead of {partial_size}; "
+                                      "partial download was discarded")
+                
+                _write_sidecar(tmp_etag_file, resp.headers.get('ETag'))
+                _write_sidecar(tmp_modified_file, resp.headers.get('Last-Modified'))
+                
+                # 206 continues the partial file, 200 replaces it
+                flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+                flags |= os.O_APPEND if status == 206 else os.O_TRUNC
+                # Only for unencoded bodies is Content-Length the size written,
+                # which _copy_to_fd needs to detect a truncated body
+                encoding = resp.headers.get('Content-Encoding', 'identity')
+                if encoding.lower() != 'identity':
+                    raise IOError(f"Unexpected Content-Encoding {encoding} from {data_url}")
+                length = resp.headers.get('Content-Length')
+                length = int(length) if length is not None else None
+                
+                fd = os.open(tmp_file, flags, 0o644)
+                try:
+                    # The file is written once front to back
+                    if hasattr(os, 'posix_fadvise'):
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    _copy_to_fd(resp, fd, length)
+                finally:
+                    os.close(fd)
+            else:
+                raise IOError(f"HTTP {status} from {data_url}")
+        
+        os.replace(tmp_file, data_file)
+        if os.path.exists(tmp_etag_file):
+            os.replace(tmp_etag_file, etag_file)
+        elif os.path.exists(etag_file):
+            os.remove(etag_file)
+        _remove_files([tmp_modified_file])
+        
+        print(f"Dataset downloaded successfully!")
+        return True
+    except Exception as e:
+        _LOG.error("Failed to download dataset: %s", e)
+        return False
\ No newline at end of file